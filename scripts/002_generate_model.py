@@ -15,6 +15,8 @@ import os
 import numpy as np
 from datetime import datetime
 
+from merchant_calibration import MerchantCalibrationTable, RISK_LEVELS
+
 # ============================================================================
 # PRE-TRAINED MODEL WEIGHTS
 # These coefficients were obtained from Logistic Regression training on
@@ -116,6 +118,9 @@ class PayGuardFraudModel:
         self.n_features = 30
         self.threshold = 0.5
         
+        # Per-merchant calibration, thresholds and risk bands
+        self.calibration = MerchantCalibrationTable(default_threshold=self.threshold)
+        
         # Model info
         self.model_info = {
             "name": "PayGuard Fraud Detector",
@@ -141,6 +146,17 @@ class PayGuardFraudModel:
             }
         }
     
+    def __setstate__(self, state):
+        """Restore pickles saved before per-merchant calibration existed"""
+        self.__dict__.update(state)
+        if "calibration" not in state:
+            self.calibration = MerchantCalibrationTable(default_threshold=self.threshold)
+    
+    def load_calibration(self, path):
+        """Attach a per-merchant calibration table saved as JSON"""
+        self.calibration = MerchantCalibrationTable.load_json(path)
+        return self.calibration
+    
     def _sigmoid(self, z):
         """Sigmoid activation with numerical stability"""
         z = np.clip(z, -500, 500)
@@ -197,6 +213,42 @@ class PayGuardFraudModel:
         else:
             return "CRITICAL"
     
+    def predict_merchant_proba(self, X, merchant_ids):
+        """
+        Predict merchant-calibrated fraud probability
+        
+        Parameters:
+        -----------
+        X : array-like of shape (n_samples, 30)
+        merchant_ids : array-like of shape (n_samples,)
+            Unknown merchants fall back to the uncalibrated model
+        
+        Returns:
+        --------
+        proba : array of shape (n_samples,)
+        """
+        p_fraud = self.predict_proba(X)[:, 1]
+        return self.calibration.calibrate(p_fraud, merchant_ids)
+    
+    def score_batch(self, X, merchant_ids):
+        """
+        Score a mixed-merchant batch in one vectorized pass
+        
+        Returns dict of arrays: probability (calibrated), prediction
+        (against each merchant's threshold), risk_level and threshold
+        """
+        p_fraud = self.predict_proba(X)[:, 1]
+        return self.calibration.score(p_fraud, merchant_ids)
+    
+    def get_risk_levels(self, probabilities, merchant_ids=None):
+        """Vectorized get_risk_level, using merchant bands if given"""
+        probabilities = np.atleast_1d(probabilities)
+        if merchant_ids is None:
+            rows = np.zeros(len(probabilities), dtype=np.int64)
+        else:
+            rows = self.calibration.resolve(merchant_ids)
+        return RISK_LEVELS[self.calibration.risk_level_codes(probabilities, rows)]
+    
     def get_feature_importance(self):
         """Get sorted feature importance"""
         importance = np.abs(self.coef_.flatten())
@@ -0,0 +1,446 @@
+"""
+PayGuard AI - Merchant Calibration Tables
+=========================================
+Per-merchant probability calibration (Platt or isotonic), decision
+thresholds and risk-level bands for PayGuardFraudModel.
+
+Every merchant is mapped to a dense row index, and all parameters live in
+flat numpy arrays indexed by that row. Isotonic knots for all merchants are
+packed into one sorted array (offset by merchant row), so a mixed-merchant
+batch is calibrated and banded in a single vectorized pass.
+
+Row 0 is the global default and is used for unknown merchants.
+
+Run: python scripts/merchant_calibration.py
+"""
+
+import json
+import time
+
+import numpy as np
+
+METHOD_IDENTITY = 0
+METHOD_PLATT = 1
+METHOD_ISOTONIC = 2
+
+METHODS = {
+    "identity": METHOD_IDENTITY,
+    "platt": METHOD_PLATT,
+    "isotonic": METHOD_ISOTONIC,
+}
+
+RISK_LEVELS = np.array(["LOW", "MEDIUM", "HIGH", "CRITICAL"])
+
+# Same cut points as PayGuardFraudModel.get_risk_level
+DEFAULT_BANDS = (0.3, 0.6, 0.8)
+DEFAULT_THRESHOLD = 0.5
+
+EPS = 1e-7
+
+
+def _logit(p):
+    p = np.clip(p, EPS, 1 - EPS)
+    return np.log(p / (1 - p))
+
+
+def _sigmoid(z):
+    z = np.clip(z, -500, 500)
+    return 1 / (1 + np.exp(-z))
+
+
+def threshold_from_risk_tolerance(risk_tolerance):
+    """
+    Map merchants.risk_tolerance (0-100) to a fraud probability threshold
+
+    Mirrors the review threshold in lib/risk-engine.ts:
+    max(50, tolerance * 0.8) on the 0-100 score scale.
+    """
+    return max(50.0, float(risk_tolerance) * 0.8) / 100.0
+
+
+def fit_platt(probabilities, labels, max_iter=100, tol=1e-9):
+    """
+    Fit Platt scaling on the model's log-odds
+
+    Returns (a, b) such that calibrated = sigmoid(a * logit(p) + b).
+    Uses Newton's method with Platt's smoothed targets.
+    """
+    z = _logit(np.asarray(probabilities, dtype=np.float64))
+    y = np.asarray(labels, dtype=np.float64)
+    n_pos = y.sum()
+    n_neg = len(y) - n_pos
+    t = np.where(y > 0, (n_pos + 1) / (n_pos + 2), 1 / (n_neg + 2))
+
+    a, b = 1.0, 0.0
+    for _ in range(max_iter):
+        p = _sigmoid(a * z + b)
+        w = p * (1 - p) + 1e-12
+        residual = p - t
+        grad = np.array([np.dot(residual, z), residual.sum()])
+        hess = np.array([
+            [np.dot(w * z, z), np.dot(w, z)],
+            [np.dot(w, z), w.sum()],
+        ]) + 1e-9 * np.eye(2)
+        step = np.linalg.solve(hess, grad)
+        a, b = a - step[0], b - step[1]
+        if np.abs(step).max() < tol:
+            break
+    return float(a), float(b)
+
+
+def fit_isotonic(probabilities, labels):
+    """
+    Fit isotonic regression with pool-adjacent-violators
+
+    Returns (x, y) knots, x strictly increasing in [0, 1] and y
+    non-decreasing, for piecewise-linear interpolation.
+    """
+    p = np.asarray(probabilities, dtype=np.float64)
+    y = np.asarray(labels, dtype=np.float64)
+    order = np.argsort(p, kind="stable")
+    p, y = p[order], y[order]
+
+    # Collapse tied scores before pooling
+    x, start = np.unique(p, return_index=True)
+    counts = np.diff(np.append(start, len(p))).astype(np.float64)
+    sums = np.add.reduceat(y, start)
+
+    block_x, block_sum, block_n = [], [], []
+    for xi, si, ni in zip(x, sums, counts):
+        block_x.append([xi])
+        block_sum.append(si)
+        block_n.append(ni)
+        while len(block_sum) > 1 and \
+                block_sum[-2] / block_n[-2] > block_sum[-1] / block_n[-1]:
+            block_x[-2].extend(block_x.pop())
+            pooled_sum = block_sum.pop()
+            block_sum[-1] += pooled_sum
+            pooled_n = block_n.pop()
+            block_n[-1] += pooled_n
+
+    knots_x, knots_y = [], []
+    for xs, s, n in zip(block_x, block_sum, block_n):
+        value = s / n
+        knots_x.append(xs[0])
+        knots_y.append(value)
+        if xs[-1] != xs[0]:
+            knots_x.append(xs[-1])
+            knots_y.append(value)
+    return np.array(knots_x), np.array(knots_y)
+
+
+class MerchantCalibrationTable:
+    """
+    Compact per-merchant calibration, threshold and band arrays
+
+    Attributes (all indexed by merchant row):
+    -----------
+    method : int8 array, METHOD_* code
+    platt_a, platt_b : float64 arrays
+    iso_start, iso_end : int64 arrays, slice of the packed isotonic knots
+    threshold : float64 array, fraud decision threshold
+    bands : float64 array of shape (n_merchants, 3), risk-level cut points
+    """
+
+    def __init__(self, default_threshold=DEFAULT_THRESHOLD, default_bands=DEFAULT_BANDS):
+        self.merchant_index = {}
+        self.merchant_ids = [None]
+        self._method = [METHOD_IDENTITY]
+        self._platt = [(1.0, 0.0)]
+        self._isotonic = [None]
+        self._threshold = [float(default_threshold)]
+        self._bands = [tuple(default_bands)]
+        self._compiled = False
+
+    def __len__(self):
+        return len(self.merchant_ids)
+
+    def __contains__(self, merchant_id):
+        return merchant_id in self.merchant_index
+
+    def add_merchant(self, merchant_id, method="identity", platt=None,
+                     isotonic=None, threshold=None, bands=None,
+                     risk_tolerance=None):
+        """
+        Register or replace one merchant's calibration
+
+        Parameters:
+        -----------
+        method : "identity", "platt" or "isotonic"
+        platt : (a, b), required for "platt"
+        isotonic : (x, y) knots, required for "isotonic"
+        threshold : float, optional decision threshold
+        bands : three increasing cut points for MEDIUM/HIGH/CRITICAL
+        risk_tolerance : int 0-100, used when threshold is not given
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown calibration method: {method}")
+        if method == "platt" and platt is None:
+            raise ValueError(f"Platt parameters required for merchant {merchant_id}")
+        if platt is not None:
+            try:
+                platt = tuple(float(v) for v in platt)
+            except (TypeError, ValueError):
+                raise ValueError(f"Malformed Platt parameters for merchant {merchant_id}") from None
+            if len(platt) != 2 or not np.all(np.isfinite(platt)):
+                raise ValueError(f"Platt parameters must be two finite floats for merchant {merchant_id}")
+        if method == "isotonic":
+            if isotonic is None:
+                raise ValueError(f"Isotonic knots required for merchant {merchant_id}")
+            x = np.asarray(isotonic[0], dtype=np.float64)
+            y = np.asarray(isotonic[1], dtype=np.float64)
+            if x.ndim != 1 or x.shape != y.shape or len(x) == 0:
+                raise ValueError(f"Malformed isotonic knots for merchant {merchant_id}")
+            if np.any(np.diff(x) < 0) or x[0] < 0 or x[-1] > 1:
+                raise ValueError(f"Isotonic knots must be sorted within [0, 1] for merchant {merchant_id}")
+            isotonic = (x, y)
+        else:
+            isotonic = None
+
+        if threshold is None:
+            if risk_tolerance is None:
+                threshold = self._threshold[0]
+            else:
+                threshold = threshold_from_risk_tolerance(risk_tolerance)
+        try:
+            threshold = float(threshold)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid threshold for merchant {merchant_id}: {threshold!r}") from None
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError(f"Threshold must be within [0, 1] for merchant {merchant_id}")
+        bands = tuple(bands) if bands is not None else self._bands[0]
+        if len(bands) != 3 or list(bands) != sorted(bands):
+            raise ValueError(f"Bands must be three increasing cut points for merchant {merchant_id}")
+
+        row = self.merchant_index.get(merchant_id)
+        if row is None:
+            row = len(self.merchant_ids)
+            self.merchant_index[merchant_id] = row
+            self.merchant_ids.append(merchant_id)
+            self._method.append(None)
+            self._platt.append(None)
+            self._isotonic.append(None)
+            self._threshold.append(None)
+            self._bands.append(None)
+
+        self._method[row] = METHODS[method]
+        self._platt[row] = platt if platt is not None else (1.0, 0.0)
+        self._isotonic[row] = isotonic
+        self._threshold[row] = float(threshold)
+        self._bands[row] = bands
+        self._compiled = False
+        return row
+
+    def compile(self):
+        """Pack the per-merchant parameters into flat arrays"""
+        self.method = np.array(self._method, dtype=np.int8)
+        platt = np.array(self._platt, dtype=np.float64)
+        self.platt_a = platt[:, 0]
+        self.platt_b = platt[:, 1]
+        self.threshold = np.array(self._threshold, dtype=np.float64)
+        self.bands = np.array(self._bands, dtype=np.float64)
+
+        # Isotonic knots, CSR-style: merchant row r owns
+        # iso_x[iso_start[r]:iso_end[r]], keyed by r + x in iso_key
+        lengths = np.array(
+            [0 if knots is None else len(knots[0]) for knots in self._isotonic],
+            dtype=np.int64)
+        self.iso_end = np.cumsum(lengths)
+        self.iso_start = self.iso_end - lengths
+        xs = [knots[0] for knots in self._isotonic if knots is not None]
+        ys = [knots[1] for knots in self._isotonic if knots is not None]
+        self.iso_x = np.concatenate(xs) if xs else np.zeros(0)
+        self.iso_y = np.concatenate(ys) if ys else np.zeros(0)
+        # Scale by 2 so each merchant's [0, 1] range stays disjoint
+        self.iso_key = np.repeat(np.arange(len(lengths)) * 2.0, lengths) + self.iso_x
+
+        self._compiled = True
+        return self
+
+    def _ensure_compiled(self):
+        if not self._compiled:
+            self.compile()
+
+    def resolve(self, merchant_ids):
+        """
+        Map merchant ids to row indices; unknown merchants map to row 0
+
+        Ids keep their Python type (42 and "42" are different merchants),
+        and missing ids such as None fall back to the default row.
+        """
+        merchant_ids = np.asarray(merchant_ids, dtype=object)
+        flat = merchant_ids.ravel().tolist()
+        rows = {m: self.merchant_index.get(m, 0) for m in set(flat)}
+        return np.fromiter(
+            map(rows.__getitem__, flat), dtype=np.int64, count=len(flat)
+        ).reshape(merchant_ids.shape)
+
+    def _isotonic_transform(self, p, rows):
+        key = rows * 2.0 + p
+        start = self.iso_start[rows]
+        last = self.iso_end[rows] - 1
+        right = np.clip(np.searchsorted(self.iso_key, key, side="right"), start, last)
+        left = np.clip(right - 1, start, last)
+
+        x0, x1 = self.iso_x[left], self.iso_x[right]
+        y0, y1 = self.iso_y[left], self.iso_y[right]
+        span = x1 - x0
+        weight = np.divide(p - x0, span, out=np.zeros_like(p), where=span > 0)
+        return y0 + np.clip(weight, 0, 1) * (y1 - y0)
+
+    def calibrate_rows(self, probabilities, rows):
+        """Calibrate probabilities for pre-resolved merchant rows"""
+        self._ensure_compiled()
+        p = np.asarray(probabilities, dtype=np.float64)
+        rows = np.asarray(rows, dtype=np.int64)
+        method = self.method[rows]
+
+        calibrated = p.copy()
+        platt = method == METHOD_PLATT
+        if platt.any():
+            r = rows[platt]
+            calibrated[platt] = _sigmoid(self.platt_a[r] * _logit(p[platt]) + self.platt_b[r])
+        isotonic = method == METHOD_ISOTONIC
+        if isotonic.any():
+            calibrated[isotonic] = self._isotonic_transform(p[isotonic], rows[isotonic])
+        return calibrated
+
+    def calibrate(self, probabilities, merchant_ids):
+        """Calibrate a mixed-merchant batch of fraud probabilities"""
+        return self.calibrate_rows(probabilities, self.resolve(merchant_ids))
+
+    def risk_level_codes(self, probabilities, rows):
+        """Risk level index (0=LOW .. 3=CRITICAL) per row"""
+        self._ensure_compiled()
+        p = np.asarray(probabilities, dtype=np.float64)
+        return (p[:, None] >= self.bands[rows]).sum(axis=1)
+
+    def score_rows(self, probabilities, rows):
+        """
+        Calibrate, threshold and band in one pass
+
+        Returns:
+        --------
+        dict of arrays: probability, prediction, risk_level, threshold
+        """
+        self._ensure_compiled()
+        rows = np.asarray(rows, dtype=np.int64)
+        calibrated = self.calibrate_rows(probabilities, rows)
+        threshold = self.threshold[rows]
+        return {
+            "probability": calibrated,
+            "prediction": (calibrated >= threshold).astype(int),
+            "risk_level": RISK_LEVELS[self.risk_level_codes(calibrated, rows)],
+            "threshold": threshold,
+        }
+
+    def score(self, probabilities, merchant_ids):
+        """Calibrate, threshold and band a mixed-merchant batch"""
+        return self.score_rows(probabilities, self.resolve(merchant_ids))
+
+    def to_records(self):
+        """Serialize merchants (excluding the default row) as JSON-safe dicts"""
+        method_names = {code: name for name, code in METHODS.items()}
+        records = []
+        for merchant_id, row in self.merchant_index.items():
+            record = {
+                "merchant_id": merchant_id,
+                "method": method_names[self._method[row]],
+                "threshold": self._threshold[row],
+                "bands": list(self._bands[row]),
+            }
+            if self._method[row] == METHOD_PLATT:
+                record["platt"] = list(self._platt[row])
+            if self._isotonic[row] is not None:
+                x, y = self._isotonic[row]
+                record["isotonic"] = [x.tolist(), y.tolist()]
+            records.append(record)
+        return records
+
+    @classmethod
+    def from_records(cls, records, default_threshold=DEFAULT_THRESHOLD,
+                     default_bands=DEFAULT_BANDS):
+        """Build and compile a table from an iterable of merchant dicts"""
+        table = cls(default_threshold, default_bands)
+        for record in records:
+            record = dict(record)
+            table.add_merchant(record.pop("merchant_id"), **record)
+        return table.compile()
+
+    def save_json(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "default": {
+                    "threshold": self._threshold[0],
+                    "bands": list(self._bands[0]),
+                },
+                "merchants": self.to_records(),
+            }, f, indent=2)
+
+    @classmethod
+    def load_json(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        default = data.get("default", {})
+        return cls.from_records(
+            data.get("merchants", []),
+            default.get("threshold", DEFAULT_THRESHOLD),
+            default.get("bands", DEFAULT_BANDS))
+
+
+def main():
+    print("=" * 60)
+    print("PayGuard AI - Merchant Calibration Tables")
+    print("=" * 60)
+
+    # Pool-adjacent-violators reference: labels 1,0,0,1,1,0,1 pool into
+    # blocks {0,1,2} -> 1/3, {3,4,5} -> 2/3 and {6} -> 1
+    knots_x, knots_y = fit_isotonic(np.arange(7) / 10, [1, 0, 0, 1, 1, 0, 1])
+    expected = np.array([1 / 3, 1 / 3, 2 / 3, 2 / 3, 1.0])
+    if not np.allclose(knots_y, expected):
+        raise AssertionError(f"Isotonic fit mismatch: {knots_y} != {expected}")
+    print(f"\nIsotonic check: knots {np.round(knots_y, 4).tolist()}")
+
+    rng = np.random.default_rng(7)
+    table = MerchantCalibrationTable()
+    n_merchants = 2000
+
+    for m in range(n_merchants):
+        raw = rng.beta(0.6, 6.0, size=400)
+        # Each merchant's true fraud rate drifts away from the global model
+        skew = rng.uniform(0.5, 2.0)
+        labels = rng.random(400) < np.clip(raw * skew, 0, 1)
+        tolerance = int(rng.integers(0, 101))
+        if m % 2 == 0:
+            table.add_merchant(f"merchant_{m}", method="platt",
+                               platt=fit_platt(raw, labels),
+                               risk_tolerance=tolerance)
+        else:
+            table.add_merchant(f"merchant_{m}", method="isotonic",
+                               isotonic=fit_isotonic(raw, labels),
+                               risk_tolerance=tolerance)
+    table.compile()
+    print(f"\nLoaded {len(table) - 1:,} merchants, "
+          f"{len(table.iso_x):,} isotonic knots")
+
+    n = 1_000_000
+    probabilities = rng.beta(0.6, 6.0, size=n)
+    merchant_ids = np.array([f"merchant_{m}" for m in range(n_merchants)] + ["unknown"])
+    batch_ids = merchant_ids[rng.integers(0, len(merchant_ids), size=n)]
+
+    start = time.perf_counter()
+    rows = table.resolve(batch_ids)
+    resolved = time.perf_counter() - start
+    start = time.perf_counter()
+    result = table.score_rows(probabilities, rows)
+    scored = time.perf_counter() - start
+
+    print(f"Resolved {n:,} merchant ids in {resolved:.3f}s")
+    print(f"Calibrated and banded {n:,} rows in {scored:.3f}s")
+    levels, counts = np.unique(result["risk_level"], return_counts=True)
+    print(f"Risk levels: {dict(zip(levels.tolist(), counts.tolist()))}")
+    print(f"Flagged: {int(result['prediction'].sum()):,}")
+
+
+if __name__ == "__main__":
+    main()
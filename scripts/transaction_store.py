@@ -0,0 +1,501 @@
+"""
+PayGuard AI - Partitioned Transaction Store
+===========================================
+Python counterpart of lib/transaction-store.ts for audit workloads.
+
+Scored transactions are appended to time-partitioned columnar segments
+(one segment per PARTITION_SECONDS window). Transaction ids and merchant
+ids are hash-indexed, and decision / status / risk-band counters are kept
+up to date on insert and review, so audit stats never rescan the data.
+
+Run: python scripts/transaction_store.py
+"""
+
+import bisect
+import copy
+import math
+import numbers
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Width of one time partition (1 hour)
+PARTITION_SECONDS = 3600
+
+# Rows reserved per segment before it grows
+SEGMENT_INITIAL_CAPACITY = 1024
+
+# Categorical columns are stored as small integer codes
+DECISIONS = ["approve", "review", "decline"]
+STATUSES = ["pending", "approved", "declined", "review", "verified"]
+RISK_LEVELS = ["low", "medium", "high", "critical"]
+REVIEW_DECISIONS = ["approved", "rejected", "escalated"]
+
+DECISION_CODES = {name: i for i, name in enumerate(DECISIONS)}
+STATUS_CODES = {name: i for i, name in enumerate(STATUSES)}
+RISK_LEVEL_CODES = {name: i for i, name in enumerate(RISK_LEVELS)}
+REVIEW_DECISION_CODES = {name: i for i, name in enumerate(REVIEW_DECISIONS)}
+
+# Status a transaction enters with, given the model decision
+DECISION_STATUS = {
+    "approve": "approved",
+    "review": "review",
+    "decline": "declined",
+}
+
+# Status a transaction moves to, given the analyst review decision
+REVIEW_STATUS = {
+    "approved": "approved",
+    "rejected": "declined",
+    "escalated": "review",
+}
+
+NO_REVIEW = -1
+
+# Marks a reviewed row whose review time was never recorded
+REVIEWED_AT_UNSET = np.nan
+
+# Risk score range, matching the transactions.risk_score CHECK constraint
+RISK_SCORE_MIN = 0
+RISK_SCORE_MAX = 100
+
+# Numeric column layout shared by every segment
+COLUMN_DTYPES = {
+    "timestamp": np.float64,
+    "amount": np.float64,
+    "fraud_probability": np.float64,
+    "risk_score": np.int16,
+    "risk_level": np.int8,
+    "decision": np.int8,
+    "status": np.int8,
+    "reviewed": np.bool_,
+    "review_decision": np.int8,
+    "reviewed_at": np.float64,
+}
+
+# Columns whose empty slots are not zero
+COLUMN_FILL = {
+    "review_decision": NO_REVIEW,
+    "reviewed_at": REVIEWED_AT_UNSET,
+}
+
+
+def _to_epoch(timestamp):
+    """Accept epoch seconds, datetime or ISO-8601 string"""
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, numbers.Real):
+        return float(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def _to_float(name, value, low=-math.inf, high=math.inf):
+    """Convert a numeric field, raising ValueError if invalid or out of range"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}: {value!r}") from None
+    if not math.isfinite(number) or not low <= number <= high:
+        raise ValueError(f"{name} out of range: {value!r}")
+    return number
+
+
+def _to_iso(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+class Segment:
+    """
+    Append-only columnar block holding one time partition
+
+    Numeric fields live in preallocated numpy arrays that double in
+    capacity when full; free-form fields are kept in parallel lists.
+    `in_order` stays True while rows arrive in timestamp order.
+    """
+
+    def __init__(self, partition_key, capacity=SEGMENT_INITIAL_CAPACITY):
+        self.partition_key = partition_key
+        self.size = 0
+        self.in_order = True
+        self.columns = {
+            name: np.full(capacity, COLUMN_FILL.get(name, 0), dtype=dtype)
+            for name, dtype in COLUMN_DTYPES.items()
+        }
+        self.ids = []
+        self.merchant_ids = []
+        self.payloads = []
+
+    @property
+    def capacity(self):
+        return len(self.columns["timestamp"])
+
+    def _grow(self):
+        new_capacity = self.capacity * 2
+        for name, column in self.columns.items():
+            grown = np.full(new_capacity, COLUMN_FILL.get(name, 0), dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def append(self, row_id, merchant_id, values, payload):
+        """Append one row and return its offset inside the segment"""
+        if self.size == self.capacity:
+            self._grow()
+        row = self.size
+        if row and values["timestamp"] < self.columns["timestamp"][row - 1]:
+            self.in_order = False
+        for name, value in values.items():
+            self.columns[name][row] = value
+        self.ids.append(row_id)
+        self.merchant_ids.append(merchant_id)
+        self.payloads.append(payload)
+        self.size += 1
+        return row
+
+    def column(self, name):
+        """Read-only view of the filled part of a column"""
+        view = self.columns[name][:self.size]
+        view.flags.writeable = False
+        return view
+
+
+class StoreStats:
+    """Running counters for one scope (whole store or one merchant)"""
+
+    def __init__(self):
+        self.total = 0
+        self.decisions = np.zeros(len(DECISIONS), dtype=np.int64)
+        self.statuses = np.zeros(len(STATUSES), dtype=np.int64)
+        self.risk_levels = np.zeros(len(RISK_LEVELS), dtype=np.int64)
+        self.pending_review = 0
+
+    def add(self, decision, status, risk_level, reviewed=False):
+        self.total += 1
+        self.decisions[decision] += 1
+        self.statuses[status] += 1
+        self.risk_levels[risk_level] += 1
+        if decision == DECISION_CODES["review"] and not reviewed:
+            self.pending_review += 1
+
+    def move_status(self, old_status, new_status):
+        self.statuses[old_status] -= 1
+        self.statuses[new_status] += 1
+
+    def to_dict(self):
+        declined = int(self.decisions[DECISION_CODES["decline"]])
+        return {
+            "total_analyzed": self.total,
+            "total_flagged": self.total - int(self.decisions[DECISION_CODES["approve"]]),
+            "total_declined": declined,
+            "pending_review": self.pending_review,
+            "by_decision": dict(zip(DECISIONS, self.decisions.tolist())),
+            "by_status": dict(zip(STATUSES, self.statuses.tolist())),
+            "by_risk_level": dict(zip(RISK_LEVELS, self.risk_levels.tolist())),
+        }
+
+
+class PartitionedTransactionStore:
+    """
+    Time-partitioned, append-only store for scored transactions
+
+    - insert / get_by_id / update_review: O(1) via the id hash index
+    - get_stats: O(1), counters are maintained on every write
+    - get_range: O(log P) to locate partitions, then slices only those
+    - get_by_merchant: O(k) over the merchant's own rows
+    """
+
+    def __init__(self, partition_seconds=PARTITION_SECONDS):
+        self.partition_seconds = partition_seconds
+        self.partitions = {}
+        self.partition_keys = []
+        self.id_index = {}
+        self.merchant_index = {}
+        self.stats = StoreStats()
+        self.merchant_stats = {}
+
+    def __len__(self):
+        return self.stats.total
+
+    def __contains__(self, transaction_id):
+        return transaction_id in self.id_index
+
+    def _partition_for(self, epoch):
+        key = int(epoch // self.partition_seconds)
+        segment = self.partitions.get(key)
+        if segment is None:
+            segment = Segment(key)
+            self.partitions[key] = segment
+            bisect.insort(self.partition_keys, key)
+        return segment
+
+    def insert(self, transaction):
+        """
+        Store an analyzed transaction
+
+        Parameters:
+        -----------
+        transaction : dict
+            Shaped like AnalyzedTransaction in lib/transaction-store.ts,
+            plus an optional merchant_id.
+
+        Returns:
+        --------
+        location : tuple (partition_key, row)
+        """
+        row_id = transaction["id"]
+        if row_id in self.id_index:
+            raise ValueError(f"Duplicate transaction id: {row_id}")
+
+        decision = transaction["decision"]
+        risk_level = transaction["risk_level"]
+        if decision not in DECISION_CODES:
+            raise ValueError(f"Unknown decision: {decision}")
+        if risk_level not in RISK_LEVEL_CODES:
+            raise ValueError(f"Unknown risk level: {risk_level}")
+
+        reviewed = bool(transaction.get("reviewed", False))
+        review_decision = transaction.get("review_decision")
+        if review_decision is not None and review_decision not in REVIEW_DECISION_CODES:
+            raise ValueError(f"Unknown review decision: {review_decision}")
+        if reviewed and review_decision is None:
+            raise ValueError(f"Reviewed transaction {row_id} has no review decision")
+        reviewed_at = REVIEWED_AT_UNSET
+        if reviewed and transaction.get("reviewed_at") is not None:
+            reviewed_at = _to_epoch(transaction["reviewed_at"])
+
+        status = transaction.get("status")
+        if not status:
+            if reviewed and review_decision is not None:
+                status = REVIEW_STATUS[review_decision]
+            else:
+                status = DECISION_STATUS[decision]
+        if status not in STATUS_CODES:
+            raise ValueError(f"Unknown status: {status}")
+
+        amount = _to_float("amount", transaction.get("amount", 0.0))
+        fraud_probability = _to_float(
+            "fraud_probability", transaction.get("fraud_probability", 0.0), 0.0, 1.0)
+        risk_score = _to_float(
+            "risk_score", transaction.get("risk_score", 0), RISK_SCORE_MIN, RISK_SCORE_MAX)
+        if not risk_score.is_integer():
+            raise ValueError(f"risk_score must be an integer: {risk_score!r}")
+
+        merchant_id = transaction.get("merchant_id")
+        epoch = _to_epoch(transaction.get("timestamp"))
+
+        values = {
+            "timestamp": epoch,
+            "amount": amount,
+            "fraud_probability": fraud_probability,
+            "risk_score": int(risk_score),
+            "risk_level": RISK_LEVEL_CODES[risk_level],
+            "decision": DECISION_CODES[decision],
+            "status": STATUS_CODES[status],
+            "reviewed": reviewed,
+            "review_decision": REVIEW_DECISION_CODES.get(review_decision, NO_REVIEW),
+            "reviewed_at": reviewed_at,
+        }
+        payload = copy.deepcopy({
+            key: value for key, value in transaction.items()
+            if key not in values and key not in ("id", "merchant_id")
+        })
+
+        segment = self._partition_for(epoch)
+        row = segment.append(row_id, merchant_id, values, payload)
+        location = (segment.partition_key, row)
+
+        self.id_index[row_id] = location
+        self.merchant_index.setdefault(merchant_id, []).append(location)
+
+        codes = (values["decision"], values["status"], values["risk_level"], reviewed)
+        self.stats.add(*codes)
+        self.merchant_stats.setdefault(merchant_id, StoreStats()).add(*codes)
+        return location
+
+    def insert_many(self, transactions):
+        """Store a batch of analyzed transactions"""
+        return [self.insert(transaction) for transaction in transactions]
+
+    def _row(self, segment, row):
+        """Materialize one row back into a transaction dict"""
+        cols = segment.columns
+        review_code = int(cols["review_decision"][row])
+        reviewed = bool(cols["reviewed"][row])
+        record = {
+            "id": segment.ids[row],
+            "merchant_id": segment.merchant_ids[row],
+            "timestamp": _to_iso(float(cols["timestamp"][row])),
+            "amount": float(cols["amount"][row]),
+            "fraud_probability": float(cols["fraud_probability"][row]),
+            "risk_score": int(cols["risk_score"][row]),
+            "risk_level": RISK_LEVELS[cols["risk_level"][row]],
+            "decision": DECISIONS[cols["decision"][row]],
+            "status": STATUSES[cols["status"][row]],
+            "reviewed": reviewed,
+        }
+        record.update(copy.deepcopy(segment.payloads[row]))
+        reviewed_at = float(cols["reviewed_at"][row])
+        if reviewed and not math.isnan(reviewed_at):
+            record["reviewed_at"] = _to_iso(reviewed_at)
+        if review_code != NO_REVIEW:
+            record["review_decision"] = REVIEW_DECISIONS[review_code]
+        return record
+
+    def get_by_id(self, transaction_id):
+        """Get transaction by ID, or None"""
+        location = self.id_index.get(transaction_id)
+        if location is None:
+            return None
+        key, row = location
+        return self._row(self.partitions[key], row)
+
+    def get_by_merchant(self, merchant_id, limit=None):
+        """Get a merchant's transactions, most recently inserted first"""
+        locations = self.merchant_index.get(merchant_id, [])
+        if limit is not None:
+            locations = locations[-limit:] if limit > 0 else []
+        return [
+            self._row(self.partitions[key], row)
+            for key, row in reversed(locations)
+        ]
+
+    def get_recent(self, limit=100):
+        """Get the newest transactions by timestamp, newest first"""
+        results = []
+        for key in reversed(self.partition_keys):
+            if len(results) >= limit:
+                break
+            segment = self.partitions[key]
+            wanted = min(limit - len(results), segment.size)
+            if segment.in_order:
+                rows = np.arange(segment.size - 1, segment.size - wanted - 1, -1)
+            else:
+                # Partition to find the cutoff, then sort only rows at or above it
+                timestamps = segment.column("timestamp")
+                kth = segment.size - wanted
+                cutoff = np.partition(timestamps, kth)[kth]
+                rows = np.flatnonzero(timestamps >= cutoff)
+                # Newest first, later insert wins ties
+                rows = rows[np.lexsort((rows, timestamps[rows]))[::-1]][:wanted]
+            for row in rows:
+                results.append(self._row(segment, int(row)))
+        return results
+
+    def get_range(self, start, end):
+        """
+        Get transactions with start <= timestamp < end, oldest first
+
+        Only partitions overlapping the window are touched.
+        """
+        start_epoch = _to_epoch(start)
+        end_epoch = _to_epoch(end)
+        first = bisect.bisect_left(
+            self.partition_keys, int(start_epoch // self.partition_seconds))
+        last = bisect.bisect_right(
+            self.partition_keys, int(end_epoch // self.partition_seconds))
+
+        results = []
+        for key in self.partition_keys[first:last]:
+            segment = self.partitions[key]
+            timestamps = segment.column("timestamp")
+            rows = np.flatnonzero((timestamps >= start_epoch) & (timestamps < end_epoch))
+            rows = rows[np.argsort(timestamps[rows], kind="stable")]
+            results.extend(self._row(segment, int(row)) for row in rows)
+        return results
+
+    def update_review(self, transaction_id, reviewed_by, review_decision, reviewed_at=None):
+        """
+        Record an analyst review and move the status counters
+
+        Returns False if the transaction does not exist.
+        """
+        if review_decision not in REVIEW_DECISION_CODES:
+            raise ValueError(f"Unknown review decision: {review_decision}")
+        location = self.id_index.get(transaction_id)
+        if location is None:
+            return False
+
+        key, row = location
+        segment = self.partitions[key]
+        cols = segment.columns
+        merchant_stats = self.merchant_stats[segment.merchant_ids[row]]
+
+        if not cols["reviewed"][row] and cols["decision"][row] == DECISION_CODES["review"]:
+            self.stats.pending_review -= 1
+            merchant_stats.pending_review -= 1
+
+        old_status = int(cols["status"][row])
+        new_status = STATUS_CODES[REVIEW_STATUS[review_decision]]
+        self.stats.move_status(old_status, new_status)
+        merchant_stats.move_status(old_status, new_status)
+
+        cols["status"][row] = new_status
+        cols["reviewed"][row] = True
+        cols["review_decision"][row] = REVIEW_DECISION_CODES[review_decision]
+        cols["reviewed_at"][row] = _to_epoch(reviewed_at)
+        segment.payloads[row]["reviewed_by"] = reviewed_by
+        return True
+
+    def get_stats(self, merchant_id=None):
+        """Audit stats for the whole store or a single merchant"""
+        if merchant_id is None:
+            return self.stats.to_dict()
+        return self.merchant_stats.get(merchant_id, StoreStats()).to_dict()
+
+
+def main():
+    print("=" * 60)
+    print("PayGuard AI - Partitioned Transaction Store")
+    print("=" * 60)
+
+    rng = np.random.default_rng(42)
+    store = PartitionedTransactionStore()
+    now = time.time()
+    n = 50000
+
+    probabilities = rng.beta(0.5, 8.0, size=n)
+    offsets = rng.uniform(0, 7 * 24 * 3600, size=n)
+    start = time.perf_counter()
+    for i in range(n):
+        p = float(probabilities[i])
+        level = RISK_LEVELS[min(int(p / 0.25), 3)]
+        decision = "approve" if p < 0.3 else "review" if p < 0.7 else "decline"
+        store.insert({
+            "id": f"tx_{i:07d}",
+            "merchant_id": f"merchant_{i % 25}",
+            "timestamp": now - float(offsets[i]),
+            "amount": round(float(rng.uniform(5, 2000)), 2),
+            "currency": "usd",
+            "fraud_probability": p,
+            "risk_score": int(p * 100),
+            "risk_level": level,
+            "decision": decision,
+        })
+    elapsed = time.perf_counter() - start
+
+    print(f"\nInserted {len(store):,} transactions into "
+          f"{len(store.partition_keys)} partitions in {elapsed:.2f}s")
+
+    start = time.perf_counter()
+    stats = store.get_stats()
+    print(f"Stats ({(time.perf_counter() - start) * 1e6:.1f}us): "
+          f"analyzed={stats['total_analyzed']:,} "
+          f"flagged={stats['total_flagged']:,} "
+          f"declined={stats['total_declined']:,} "
+          f"pending={stats['pending_review']:,}")
+
+    start = time.perf_counter()
+    record = store.get_by_id("tx_0012345")
+    print(f"Lookup ({(time.perf_counter() - start) * 1e6:.1f}us): "
+          f"{record['id']} -> {record['decision']} ({record['risk_level']})")
+
+    recent = store.get_recent(5)
+    print(f"Most recent: {[tx['id'] for tx in recent]}")
+
+
+if __name__ == "__main__":
+    main()